@@ -17,6 +17,12 @@ Use the Chain of Responsibility pattern when your program is expected to process
 """
 
 from abc import ABC, abstractmethod
+from bisect import bisect_left
+import asyncio
+import time
+
+# Returned by Handler.process when the handler passes the request on instead of handling it.
+PASSED = object()
 
 
 class HandlerInterface(ABC):
@@ -37,18 +43,51 @@ class Handler(HandlerInterface):
     """
        The default chaining behavior can be implemented inside a base handler
        class.
+       Concrete handlers implement process(), which handles a request or returns PASSED,
+       so a handler can be run on its own without walking the rest of the chain.
+       A handler may declare the requests it matches in `keys`. Handlers with keys can be
+       compiled into a dispatch table by ChainCompiler; handlers without keys only use a predicate
+       inside process() and are visited by walking the chain.
        """
     nexthandler = None
+    keys = ()
 
     def setnext(self, handler):
         self.nexthandler = handler
         return handler
 
+    def process(self, request):
+        return PASSED
+
     def handle(self, request):
+        result = self.process(request)
+        if result is not PASSED:
+            return result
         if self.nexthandler is not None:
             return self.nexthandler.handle(request)
         return None
 
+    def try_handle(self, request):
+        """
+            Run only this handler. Returns PASSED if it would pass the request to the next handler.
+            A handler overriding handle() instead of process() can't be run on its own, it gets
+            the request together with the rest of the chain, which gives the same result.
+            """
+        if type(self).handle is not Handler.handle:
+            return self.handle(request)
+        return self.process(request)
+
+    def handle_batch(self, requests):
+        """
+            Handle a sub-batch of requests this handler accepts. Handlers able to process many
+            requests at once override this; the default adapts the single-request handle().
+            """
+        return [self.handle(request) for request in requests]
+
+    def handle_many(self, requests):
+        "Route a batch through the chain starting at this handler, results in the original order."
+        return ChainCompiler().compile(self).handle_many(requests)
+
 
 """
 All Concrete Handlers either handle a request or pass it to the next handler in
@@ -56,38 +95,353 @@ the chain.
 """
 class FirstHandler(Handler):
 
-    def handle(self, request):
+    keys = ("First",)
+
+    def process(self, request):
         if request == "First":
             return "Handled at First"
         else:
-            return super().handle(request)
+            return PASSED
 
 
 class SecondHandler(Handler):
 
-    def handle(self, request):
+    keys = ("Second",)
+
+    def process(self, request):
         if request == "Second":
             return "Handled at Second"
         else:
-            return super().handle(request)
+            return PASSED
 
 
 class ThirdHandler(Handler):
 
-    def handle(self, request):
+    keys = ("Third",)
+
+    def process(self, request):
         if request == "Third":
             return "Handled at Third"
         else:
-            return super().handle(request)
+            return PASSED
 
 
 class LastHandler(Handler):
 
-    def handle(self, request):
+    keys = ("Last",)
+
+    def process(self, request):
         if request == "Last":
             return "Handled at Last"
         else:
-            return super().handle(request)
+            return PASSED
+
+
+class CompiledChain(object):
+    """
+        A chain turned into a hash-indexed dispatch table. A request whose key is in the table goes
+        straight to its handler in O(1); only the predicate handlers placed before that handler
+        in the original chain are tried first, so the result is the same as walking the chain.
+        """
+    def __init__(self, table, predicates):
+        self._table = table
+        self._predicates = predicates
+
+    def _lookup(self, request):
+        try:
+            return self._table.get(request, (None, None))
+        except TypeError:  # unhashable request, only predicates can match it
+            return None, None
+
+    def handle(self, request):
+        position, handler = self._lookup(request)
+        for pos, predicate in self._predicates:
+            if position is not None and pos > position:
+                break
+            result = predicate.try_handle(request)
+            if result is not PASSED:
+                return result
+        if handler is not None:
+            return handler.handle(request)
+        return None
+
+    def handle_many(self, requests):
+        """
+            Split the batch by the handler accepting each request and call every keyed handler
+            once with its sub-batch. Predicate handlers still see each request that could reach them.
+            """
+        requests = list(requests)
+        results = [None] * len(requests)
+        targets = [self._lookup(request) for request in requests]
+        unresolved = list(range(len(requests)))
+        for pos, predicate in self._predicates:
+            remaining = []
+            for index in unresolved:
+                position = targets[index][0]
+                if position is not None and pos > position:
+                    remaining.append(index)
+                    continue
+                result = predicate.try_handle(requests[index])
+                if result is PASSED:
+                    remaining.append(index)
+                else:
+                    results[index] = result
+            unresolved = remaining
+        buckets = {}
+        for index in unresolved:
+            position, handler = targets[index]
+            if handler is not None:
+                buckets.setdefault(position, (handler, []))[1].append(index)
+        for position in sorted(buckets):
+            handler, indexes = buckets[position]
+            batch_results = handler.handle_batch([requests[index] for index in indexes])
+            for index, result in zip(indexes, batch_results):
+                results[index] = result
+        return results
+
+
+class ChainCompiler(object):
+    """
+        Follows the setnext links starting from the first handler and builds a CompiledChain.
+        The first handler declaring a key wins, as it would when walking the chain. A cycle in
+        the links ends the compilation at the handler already seen.
+        """
+    def compile(self, first):
+        table = {}
+        predicates = []
+        seen = set()
+        handler = first
+        position = 0
+        while handler is not None and id(handler) not in seen:
+            seen.add(id(handler))
+            if handler.keys:
+                for key in handler.keys:
+                    table.setdefault(key, (position, handler))
+            else:
+                predicates.append((position, handler))
+            handler = handler.nexthandler
+            position += 1
+        return CompiledChain(table, predicates)
+
+
+class HopLimitExceeded(Exception):
+    pass
+
+
+class ChainExecutor(object):
+    """
+        Runs a chain as a loop instead of recursing through handle(), so long chains don't pay a
+        stack frame per hop and cannot overflow the stack. The links are followed once when the
+        executor is built: a cycle is detected there and the loop stops after every distinct
+        handler was tried, since trying a handler again cannot change its answer. The results are
+        the same as first.handle(request), except that an unmatched request on a cyclic chain
+        returns None instead of raising RecursionError. A handler overriding handle() instead of
+        process() walks the rest of the chain recursively, as described in Handler.try_handle.
+        Relinking the handlers after the executor is built requires a new executor.
+        """
+    def __init__(self, first, max_hops=None):
+        self._handlers = []
+        self.cycle_to = None
+        seen = set()
+        handler = first
+        while handler is not None:
+            if id(handler) in seen:
+                self.cycle_to = handler
+                break
+            seen.add(id(handler))
+            self._handlers.append(handler)
+            handler = handler.nexthandler
+        self._max_hops = max_hops
+
+    @property
+    def cyclic(self):
+        return self.cycle_to is not None
+
+    def handle(self, request):
+        for hops, handler in enumerate(self._handlers):
+            if self._max_hops is not None and hops > self._max_hops:
+                raise HopLimitExceeded(f"request passed more than {self._max_hops} handlers")
+            result = handler.try_handle(request)
+            if result is not PASSED:
+                return result
+        return None
+
+
+class HandlerStats(object):
+    "Counters and a latency histogram, in microseconds, for one handler of an InstrumentedChain."
+    buckets = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, float("inf"))
+
+    def __init__(self):
+        self.tried = 0
+        self.matched = 0
+        self.total_us = 0.0
+        self.histogram = [0] * len(self.buckets)
+
+    def record(self, elapsed_us, matched):
+        self.tried += 1
+        self.matched += matched
+        self.total_us += elapsed_us
+        self.histogram[bisect_left(self.buckets, elapsed_us)] += 1
+
+    @property
+    def hit_rate(self):
+        return self.matched / self.tried if self.tried else 0.0
+
+
+class InstrumentedChain(ChainExecutor):
+    """
+        ChainExecutor counting how often each handler is tried and matches, and how long it takes.
+        With `order_insensitive` set, the chain is adaptive: every `reorder_every` requests the
+        handlers matching most often in the recent traffic are moved to the front, so the average
+        walk follows the live mix. Only mark a chain order-insensitive when no two handlers
+        accept the same request, otherwise reordering changes which handler answers.
+        """
+    def __init__(self, first, max_hops=None, order_insensitive=False, reorder_every=1000):
+        super().__init__(first, max_hops)
+        self._stats = {id(handler): HandlerStats() for handler in self._handlers}
+        self._order_insensitive = order_insensitive
+        self._reorder_every = reorder_every
+        self._recent = dict.fromkeys(self._stats, 0)
+        self._requests = 0
+
+    def handle(self, request):
+        result = None
+        for hops, handler in enumerate(self._handlers):
+            if self._max_hops is not None and hops > self._max_hops:
+                raise HopLimitExceeded(f"request passed more than {self._max_hops} handlers")
+            start = time.perf_counter()
+            answer = handler.try_handle(request)
+            matched = answer is not PASSED
+            self._stats[id(handler)].record((time.perf_counter() - start) * 1e6, matched)
+            if matched:
+                self._recent[id(handler)] += 1
+                result = answer
+                break
+        self._requests += 1
+        if self._order_insensitive and self._requests % self._reorder_every == 0:
+            self._reorder()
+        return result
+
+    def _reorder(self):
+        self._handlers.sort(key=lambda handler: self._recent[id(handler)], reverse=True)
+        for key in self._recent:  # halve the counts so older traffic fades out
+            self._recent[key] //= 2
+
+    def stats(self):
+        "Handlers in their current order with their HandlerStats."
+        return [(handler, self._stats[id(handler)]) for handler in self._handlers]
+
+    def report(self):
+        for handler, stats in self.stats():
+            mean = stats.total_us / stats.tried if stats.tried else 0.0
+            print(f"{type(handler).__name__}{list(handler.keys)}: tried {stats.tried}, matched {stats.matched}"
+                  f" ({stats.hit_rate:.0%}), mean {mean:.2f}us")
+
+
+class AsyncHandler(HandlerInterface):
+    """
+        Base handler for chains whose handlers wait on slow I/O. Concrete handlers implement the
+        awaitable process(), returning PASSED to let the next handler try the request.
+        `concurrency` caps how many requests process() runs at once in this handler, and after
+        `timeout` seconds the request is passed down the chain as if the handler declined it.
+        The concurrency slot is released before the request moves on to the next handler.
+        """
+    nexthandler = None
+
+    def __init__(self, concurrency=None, timeout=None):
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        self._timeout = timeout
+
+    def setnext(self, handler):
+        self.nexthandler = handler
+        return handler
+
+    async def handle(self, request):
+        result = await self._run(request)
+        if result is not PASSED:
+            return result
+        if self.nexthandler is not None:
+            return await self.nexthandler.handle(request)
+        return None
+
+    async def _run(self, request):
+        if self._semaphore is None:
+            return await self._process_with_timeout(request)
+        async with self._semaphore:
+            return await self._process_with_timeout(request)
+
+    async def _process_with_timeout(self, request):
+        if self._timeout is None:
+            return await self.process(request)
+        try:
+            return await asyncio.wait_for(self.process(request), self._timeout)
+        except asyncio.TimeoutError:
+            return PASSED
+
+    async def process(self, request):
+        return PASSED
+
+
+class AsyncLookupHandler(AsyncHandler):
+    "Example handler waiting on a back end before accepting its requests."
+
+    def __init__(self, name, delay, concurrency=None, timeout=None):
+        super().__init__(concurrency, timeout)
+        self._name = name
+        self._delay = delay
+
+    async def process(self, request):
+        await asyncio.sleep(self._delay)
+        if request == self._name:
+            return f"Handled at {self._name}"
+        return PASSED
+
+
+async def handle_all(first, requests, max_in_flight=10000):
+    "Drive many requests through an async chain on one event loop, results in the original order."
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def run(request):
+        async with in_flight:
+            return await first.handle(request)
+
+    return await asyncio.gather(*(run(request) for request in requests))
+
+
+class KeyHandler(Handler):
+    "Handler matching a single key given at construction time, used to build long chains."
+
+    def __init__(self, key):
+        self.keys = (key,)
+
+    def process(self, request):
+        if request == self.keys[0]:
+            return f"Handled at {self.keys[0]}"
+        else:
+            return PASSED
+
+
+def build_chain(length):
+    handlers = [KeyHandler(i) for i in range(length)]
+    for current, following in zip(handlers, handlers[1:]):
+        current.setnext(following)
+    return handlers[0]
+
+
+def benchmark_dispatch(lengths=(4, 32, 128, 256), repeat=2000):
+    "Compare latency of walking the chain with the compiled dispatch for a request matched at the end."
+    print("chain length | walk (us/request) | compiled (us/request)")
+    for length in lengths:
+        first = build_chain(length)
+        compiled = ChainCompiler().compile(first)
+        request = length - 1
+        timings = []
+        for dispatch in (first.handle, compiled.handle):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                dispatch(request)
+            timings.append((time.perf_counter() - start) / repeat * 1e6)
+        print(f"{length:12} | {timings[0]:17.2f} | {timings[1]:21.2f}")
 
 
 if __name__ == "__main__":
@@ -103,4 +457,30 @@ if __name__ == "__main__":
     forth.setnext(first)  # cyclic dependency. Not a good thing
 
     ans = second.handle("First")
-    print(ans)
\ No newline at end of file
+    print(ans)
+
+    compiled = ChainCompiler().compile(second)
+    print(compiled.handle("First"))
+    print(compiled.handle("Unknown"))
+
+    executor = ChainExecutor(second, max_hops=10)
+    print(executor.cyclic)
+    print(executor.handle("First"))
+    print(executor.handle("Unknown"))  # second.handle("Unknown") raises RecursionError
+
+    print(first.handle_many(["Last", "First", "Unknown", "Third", "First"]))
+
+    instrumented = InstrumentedChain(first, order_insensitive=True, reorder_every=100)
+    for request in ["Last"] * 300 + ["Third"] * 100 + ["First"] * 10:
+        instrumented.handle(request)
+    instrumented.report()
+
+    fast = AsyncLookupHandler("Cache", 0.01, concurrency=1000)
+    slow = AsyncLookupHandler("Database", 5, concurrency=100, timeout=0.05)
+    fallback = AsyncLookupHandler("Database", 0.01)
+    fast.setnext(slow).setnext(fallback)
+    start = time.perf_counter()
+    answers = asyncio.run(handle_all(fast, ["Cache", "Database"] * 2000))
+    print(answers[:2], f"{len(answers)} requests in {time.perf_counter() - start:.2f}s")
+
+    benchmark_dispatch()
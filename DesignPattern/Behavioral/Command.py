@@ -18,7 +18,17 @@ doing network calls like RESTApi calls
 """
 
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List
+import asyncio
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
 
 #receiver
 class Light():
@@ -28,10 +38,14 @@ class Light():
         fact, any class may serve as a Receiver.
         This will execute on the action in the end.
         """
+    is_on = False
+
     def execute_ON(self):
+        self.is_on = True
         print("Light is ON")
 
     def execute_OFF(self):
+        self.is_on = False
         print("Light is Off")
 
 #command
@@ -43,6 +57,32 @@ class CommandInterface(ABC):
     def execute(self):
         pass
 
+    def affinity(self):
+        "Commands returning the same object here are executed one after another, in submit order."
+        return self
+
+    def inverse(self):
+        """
+            Called just before execute(). Commands that can compute their own inverse return a
+            command undoing what execute() is about to do, None otherwise.
+            """
+        return None
+
+    def snapshot(self):
+        "Called just before execute() when there is no inverse. Returns state for restore(), or None."
+        return None
+
+    def restore(self, snapshot):
+        pass
+
+    def coalesce_key(self):
+        "Queued commands with the same non-None key are merged before they execute."
+        return None
+
+    def merge(self, previous):
+        "Net command of `previous` followed by this one, or None when the two cancel out."
+        return self
+
 class Command_ON(CommandInterface):
 
     def __init__(self, light):
@@ -51,6 +91,15 @@ class Command_ON(CommandInterface):
     def execute(self):
         self._light.execute_ON()
 
+    def affinity(self):
+        return self._light
+
+    def inverse(self):
+        return Command_ON(self._light) if self._light.is_on else Command_OFF(self._light)
+
+    def coalesce_key(self):
+        return id(self._light)
+
 
 class Command_OFF(CommandInterface):
 
@@ -60,6 +109,15 @@ class Command_OFF(CommandInterface):
     def execute(self):
         self._light.execute_OFF()
 
+    def affinity(self):
+        return self._light
+
+    def inverse(self):
+        return Command_ON(self._light) if self._light.is_on else Command_OFF(self._light)
+
+    def coalesce_key(self):
+        return id(self._light)
+
 #invoker
 class CommandInvoker():
     """
@@ -79,6 +137,607 @@ class CommandInvoker():
             print("Command not found")
 
 
+class ExecutorCommandInvoker(CommandInvoker):
+    """
+        Invoker running the commands on a thread or process pool, so one slow execute() doesn't
+        block the caller. submit() returns a Future. Commands with the same affinity, e.g. the ones
+        sharing a Light, wait in a lane and run in submit order; other commands run in parallel.
+        With a process pool the commands are pickled and execute on a copy of their receiver.
+        """
+    def __init__(self, pool="thread", max_workers=None):
+        super().__init__()
+        if pool == "thread":
+            self._pool = ThreadPoolExecutor(max_workers)
+        elif pool == "process":
+            self._pool = ProcessPoolExecutor(max_workers)
+        else:
+            raise ValueError(f"unknown pool {pool!r}, use 'thread' or 'process'")
+        self._lanes = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def run(self, commandName):
+        if commandName in self.commandListStack.keys():
+            self.submit(commandName).result()
+        else:
+            print("Command not found")
+
+    def submit(self, commandName):
+        future = Future()
+        command = self.commandListStack.get(commandName)
+        if command is None:
+            future.set_exception(KeyError(f"Command {commandName} not found"))
+            return future
+        key = id(command.affinity())
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("cannot submit after shutdown")
+            if key in self._lanes:
+                self._lanes[key].append((command, future))
+                return future
+            self._lanes[key] = deque()
+        self._start(key, command, future)
+        return future
+
+    def _start(self, key, command, future):
+        while future is not None:
+            if future.set_running_or_notify_cancel():  # False if cancelled while waiting in its lane
+                try:
+                    inner = self._pool.submit(command.execute)
+                except RuntimeError as error:  # the pool was shut down without waiting
+                    future.set_exception(error)
+                else:
+                    inner.add_done_callback(lambda done: self._finish(key, future, done))
+                    return
+            command, future = self._next_in_lane(key)
+
+    def _finish(self, key, future, done):
+        if done.exception() is not None:
+            future.set_exception(done.exception())
+        else:
+            future.set_result(done.result())
+        command, following = self._next_in_lane(key)
+        if following is not None:
+            self._start(key, command, following)
+
+    def _next_in_lane(self, key):
+        with self._condition:
+            lane = self._lanes[key]
+            if lane:
+                return lane.popleft()
+            del self._lanes[key]
+            self._condition.notify_all()
+            return None, None
+
+    def shutdown(self, wait=True):
+        """
+            Stop accepting commands and, with wait, drain every lane before stopping the pool.
+            Without wait, the commands still waiting in a lane are cancelled.
+            """
+        queued = []
+        with self._condition:
+            self._closed = True
+            if wait:
+                self._condition.wait_for(lambda: not self._lanes)
+            else:
+                for lane in self._lanes.values():
+                    queued.extend(future for _, future in lane)
+                    lane.clear()
+        for future in queued:
+            future.cancel()
+        self._pool.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class CommandLog(object):
+    """
+        Append-only write-ahead log of executed command names. Every record is framed as
+        <payload length, crc32> followed by the utf-8 name. Appends wait until their record is on
+        disk, but a writer thread commits whatever accumulated during `commit_interval` with a
+        single write and fsync (group commit), so many concurrent appends share one fsync.
+        A checkpoint stores a snapshot of the receivers' state and truncates the log, which keeps
+        the replay window bounded. If a write or fsync fails the log stops accepting records:
+        the pending appends and every later one raise that OSError.
+        """
+    _header = struct.Struct("<II")
+
+    def __init__(self, path, commit_interval=0.002):
+        self._path = path
+        self._checkpoint_path = path + ".checkpoint"
+        self._commit_interval = commit_interval
+        self._file = open(path, "ab")
+        self._pending = []
+        self._appended = 0
+        self._durable = 0
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._writer = threading.Thread(target=self._commit_loop, daemon=True)
+        self._writer.start()
+
+    def append(self, commandName):
+        payload = commandName.encode()
+        frame = self._header.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("command log is closed")
+            if self._error is not None:
+                raise self._error
+            self._pending.append(frame)
+            self._appended += 1
+            sequence = self._appended
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self._durable >= sequence or self._error is not None)
+            if self._durable < sequence:
+                raise self._error
+
+    def _commit_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+            time.sleep(self._commit_interval)  # let concurrent appends join this group
+            with self._condition:
+                frames, self._pending = self._pending, []
+                committed = self._appended
+            try:
+                self._file.write(b"".join(frames))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as error:  # e.g. disk full, the records may or may not be on disk
+                with self._condition:
+                    self._error = error
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._durable = committed
+                self._condition.notify_all()
+
+    def checkpoint(self, snapshot):
+        """
+            Durably store a snapshot and drop the records it covers. snapshot is called while the
+            log is locked and every appended record is on disk, and returns the snapshot bytes,
+            so no record can be appended between taking the snapshot and truncating the log.
+            """
+        with self._condition:
+            self._condition.wait_for(lambda: self._durable == self._appended or self._error is not None)
+            if self._error is not None:
+                raise self._error
+            temporary = self._checkpoint_path + ".tmp"
+            with open(temporary, "wb") as file:
+                file.write(snapshot())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self._checkpoint_path)
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def replay(self):
+        """
+            Return the last checkpoint snapshot (or None) and the command names logged after it.
+            A torn or corrupt record at the tail, left by a crash, ends the replay and is cut off.
+            """
+        snapshot = None
+        if os.path.exists(self._checkpoint_path):
+            with open(self._checkpoint_path, "rb") as file:
+                snapshot = file.read()
+        with self._condition:
+            with open(self._path, "rb") as file:
+                data = memoryview(file.read())
+            names = []
+            offset = 0
+            size = self._header.size
+            while offset + size <= len(data):
+                length, checksum = self._header.unpack_from(data, offset)
+                payload = data[offset + size:offset + size + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                names.append(str(payload, "utf-8"))
+                offset += size + length
+            if offset < len(data):
+                self._file.truncate(offset)
+        return snapshot, names
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join()
+        self._file.close()
+
+
+class LoggingCommandInvoker(CommandInvoker):
+    """
+        Invoker writing every command to a CommandLog before executing it, so the receivers'
+        state can be rebuilt on startup by replaying the log.
+        A checkpoint waits until no command is between being logged and being executed, and
+        holds new commands back until the snapshot is stored.
+        """
+    def __init__(self, log):
+        super().__init__()
+        self._log = log
+        self._running = 0
+        self._checkpointing = False
+        self._idle = threading.Condition()
+
+    def run(self, commandName):
+        if commandName in self.commandListStack.keys():
+            with self._idle:
+                self._idle.wait_for(lambda: not self._checkpointing)
+                self._running += 1
+            try:
+                self._log.append(commandName)
+                self.commandListStack[commandName].execute()
+            finally:
+                with self._idle:
+                    self._running -= 1
+                    self._idle.notify_all()
+        else:
+            print("Command not found")
+
+    def recover(self, restore=None):
+        """
+            Rebuild the receivers' state: restore is called with the checkpoint snapshot, if there
+            is one, then the commands logged after it are executed again without logging them
+            twice. Logged commands which are no longer registered are skipped. Returns the number
+            of replayed commands.
+            """
+        snapshot, names = self._log.replay()
+        if snapshot is not None and restore is not None:
+            restore(snapshot)
+        replayed = 0
+        for commandName in names:
+            if commandName not in self.commandListStack:
+                print(f"Command {commandName} not found, skipped during recovery")
+                continue
+            self.commandListStack[commandName].execute()
+            replayed += 1
+        return replayed
+
+    def checkpoint(self, snapshot):
+        "snapshot is called with no command in flight and returns the receivers' state as bytes."
+        with self._idle:
+            self._idle.wait_for(lambda: not self._checkpointing)
+            self._checkpointing = True
+            self._idle.wait_for(lambda: self._running == 0)
+        try:
+            self._log.checkpoint(snapshot)
+        finally:
+            with self._idle:
+                self._checkpointing = False
+                self._idle.notify_all()
+
+    def close(self):
+        self._log.close()
+
+
+def estimate_size(obj, seen=None):
+    "Rough number of bytes held by obj and the containers and attributes it owns."
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key, seen) + estimate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += estimate_size(vars(obj), seen)
+    return size
+
+
+class UndoableCommandInvoker(CommandInvoker):
+    """
+        Invoker keeping a multi-level undo/redo history. For each executed command the history
+        stores only its inverse command when it can compute one, and a snapshot of the state
+        otherwise. The history is a ring buffer: the oldest entries are dropped once it holds more
+        than `max_entries` entries or more than `max_bytes` estimated bytes. The estimate of an
+        inverse command doesn't include the receiver it shares with the original command.
+        A command which can neither invert nor snapshot itself clears the history, because the
+        older entries couldn't be undone correctly past it.
+        """
+    def __init__(self, max_entries=1000, max_bytes=1 << 20):
+        super().__init__()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._undo = deque()  # (command, inverse or None, snapshot, size)
+        self._redo = []
+        self._bytes = 0
+        self._executed = 0
+        self._evicted = 0
+
+    def run(self, commandName):
+        if commandName in self.commandListStack.keys():
+            self._redo.clear()
+            self._execute(self.commandListStack[commandName])
+        else:
+            print("Command not found")
+
+    def _execute(self, command):
+        inverse = command.inverse()
+        snapshot = command.snapshot() if inverse is None else None
+        command.execute()
+        self._executed += 1
+        if inverse is None and snapshot is None:
+            self._evict(len(self._undo))
+            return
+        if inverse is not None:
+            size = sys.getsizeof(inverse) + sys.getsizeof(vars(inverse))
+        else:
+            size = estimate_size(snapshot)
+        self._undo.append((command, inverse, snapshot, size))
+        self._bytes += size
+        while len(self._undo) > self._max_entries or (self._bytes > self._max_bytes and len(self._undo) > 1):
+            self._evict(1)
+
+    def _evict(self, count):
+        for _ in range(count):
+            size = self._undo.popleft()[3]
+            self._bytes -= size
+            self._evicted += 1
+
+    def undo(self, steps=1):
+        "Undo up to `steps` commands, returns how many were undone."
+        done = 0
+        while done < steps and self._undo:
+            command, inverse, snapshot, size = self._undo.pop()
+            self._bytes -= size
+            if inverse is not None:
+                inverse.execute()
+            else:
+                command.restore(snapshot)
+            self._redo.append(command)
+            done += 1
+        return done
+
+    def redo(self, steps=1):
+        done = 0
+        while done < steps and self._redo:
+            self._execute(self._redo.pop())
+            done += 1
+        return done
+
+    def history_stats(self):
+        return {
+            "entries": len(self._undo),
+            "bytes": self._bytes,
+            "redo_entries": len(self._redo),
+            "executed": self._executed,
+            "evicted": self._evicted,
+            "inverse_entries": sum(1 for entry in self._undo if entry[1] is not None),
+        }
+
+
+class QueuedCommandInvoker(CommandInvoker):
+    """
+        Invoker queueing commands and executing only their net effect on flush(). Commands with
+        the same coalesce_key are merged into one as they arrive, keeping the slot of the first
+        one, so a burst ON, OFF, ON to one Light reaches it as a single ON. With a `flush_interval`
+        a background thread flushes the queue periodically. Commands with different keys keep
+        their arrival order. A command raising in flush() is counted in `failed` and doesn't
+        stop the commands after it.
+        """
+    def __init__(self, flush_interval=None):
+        super().__init__()
+        self._queue = {}
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.submitted = 0
+        self.executed = 0
+        self.failed = 0
+        self._stopped = threading.Event()
+        self._flusher = None
+        if flush_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+            self._flusher.start()
+
+    def run(self, commandName):
+        if commandName not in self.commandListStack.keys():
+            print("Command not found")
+            return
+        command = self.commandListStack[commandName]
+        key = command.coalesce_key()
+        with self._lock:
+            self.submitted += 1
+            if key is None:
+                self._sequence += 1
+                self._queue[(None, self._sequence)] = command
+            elif key in self._queue:
+                merged = command.merge(self._queue[key])
+                if merged is None:
+                    del self._queue[key]
+                else:
+                    self._queue[key] = merged
+            else:
+                self._queue[key] = command
+
+    def flush(self):
+        "Execute the queued commands, returns how many of them ran without raising."
+        with self._lock:
+            commands, self._queue = list(self._queue.values()), {}
+        executed = 0
+        for command in commands:
+            try:
+                command.execute()
+            except Exception as error:
+                print(f"Command failed: {error!r}")
+                with self._lock:
+                    self.failed += 1
+            else:
+                executed += 1
+        with self._lock:
+            self.executed += executed
+        return executed
+
+    def _flush_loop(self, interval):
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def close(self):
+        "Stop the background flushing and execute what is still queued."
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+
+class ScheduledCommand(object):
+    "Handle of a command scheduled on a TimerWheelScheduler."
+    __slots__ = ("commandName", "deadline", "interval", "slot", "cancelled")
+
+    def __init__(self, commandName, deadline, interval):
+        self.commandName = commandName
+        self.deadline = deadline
+        self.interval = interval
+        self.slot = None
+        self.cancelled = False
+
+
+class TimerWheelScheduler(object):
+    """
+        Runs delayed and periodic commands of an invoker from a hierarchical timer wheel instead
+        of one threading.Timer per command. Time advances in ticks of `tick` seconds. Level 0 has
+        one slot per tick, every next level has slots `wheel_size` times wider, and when a lower
+        wheel wraps around the timers of the next level's slot are spread down again (cascade).
+        Scheduling and cancelling are O(1): a timer is a key in the dict of its slot.
+        A single driver, the start() thread or the run_async() task, advances the wheel.
+        A command raising is counted in `failed` and doesn't stop the driver or the other timers.
+        """
+    def __init__(self, invoker, tick=0.01, wheel_size=256, levels=4):
+        self._invoker = invoker
+        self._tick = tick
+        self._bits = wheel_size.bit_length() - 1
+        if 1 << self._bits != wheel_size:
+            raise ValueError("wheel_size must be a power of two")
+        self._mask = wheel_size - 1
+        self._wheels = [[{} for _ in range(wheel_size)] for _ in range(levels)]
+        self._current = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._driver = None
+        self.pending = 0
+        self.failed = 0
+
+    def schedule(self, commandName, delay, interval=None):
+        "Run the command after `delay` seconds, then every `interval` seconds if given."
+        ticks = max(1, round(delay / self._tick))
+        period = max(1, round(interval / self._tick)) if interval is not None else None
+        with self._lock:
+            timer = ScheduledCommand(commandName, self._current + ticks, period)
+            self._place(timer)
+            self.pending += 1
+        return timer
+
+    def cancel(self, timer):
+        with self._lock:
+            if timer.slot is not None:
+                del timer.slot[timer]
+                timer.slot = None
+                self.pending -= 1
+            timer.cancelled = True
+
+    def _place(self, timer):
+        delta = timer.deadline - self._current
+        level = 0
+        while delta >> (self._bits * (level + 1)):
+            level += 1
+            if level == len(self._wheels):
+                raise ValueError("delay is beyond the range of the timer wheel")
+        slot = self._wheels[level][(timer.deadline >> (self._bits * level)) & self._mask]
+        slot[timer] = None
+        timer.slot = slot
+
+    def advance(self, ticks=1):
+        "Move the wheel forward and execute the commands falling due."
+        for _ in range(ticks):
+            with self._lock:
+                self._current += 1
+                current = self._current
+                for level in range(1, len(self._wheels)):
+                    if current & ((1 << (self._bits * level)) - 1):
+                        break
+                    slot = self._wheels[level][(current >> (self._bits * level)) & self._mask]
+                    timers = list(slot)
+                    slot.clear()
+                    for timer in timers:
+                        self._place(timer)
+                slot = self._wheels[0][current & self._mask]
+                expired = list(slot)
+                slot.clear()
+                for timer in expired:
+                    timer.slot = None
+                    if timer.interval is not None:
+                        timer.deadline += timer.interval
+                        self._place(timer)
+                    else:
+                        self.pending -= 1
+            for timer in expired:
+                try:
+                    self._invoker.run(timer.commandName)
+                except Exception as error:
+                    print(f"Command {timer.commandName} failed: {error!r}")
+                    self.failed += 1
+
+    def _due_ticks(self, started):
+        return int((time.monotonic() - started) / self._tick) - self._current
+
+    def start(self):
+        "Advance the wheel from a single background thread."
+        def drive():
+            started = time.monotonic() - self._current * self._tick
+            while not self._stopped.wait(self._tick):
+                self.advance(max(0, self._due_ticks(started)))
+
+        self._driver = threading.Thread(target=drive, daemon=True)
+        self._driver.start()
+
+    async def run_async(self):
+        "Advance the wheel from an asyncio task until stop() is called."
+        started = time.monotonic() - self._current * self._tick
+        while not self._stopped.is_set():
+            await asyncio.sleep(self._tick)
+            self.advance(max(0, self._due_ticks(started)))
+
+    def stop(self):
+        self._stopped.set()
+        if self._driver is not None:
+            self._driver.join()
+
+
+class NoOpCommand(CommandInterface):
+
+    def execute(self):
+        pass
+
+
+def benchmark_scheduler(pending=1_000_000):
+    "Scheduling overhead of the timer wheel with `pending` timers waiting."
+    invoker = CommandInvoker()
+    invoker.register("NOOP", NoOpCommand())
+    scheduler = TimerWheelScheduler(invoker, tick=0.001)
+    start = time.perf_counter()
+    timers = [scheduler.schedule("NOOP", 0.001 * (1 + i % 600000)) for i in range(pending)]
+    scheduled = time.perf_counter() - start
+    start = time.perf_counter()
+    for timer in timers[::2]:
+        scheduler.cancel(timer)
+    cancelled = time.perf_counter() - start
+    start = time.perf_counter()
+    scheduler.advance(1000)
+    advanced = time.perf_counter() - start
+    print(f"schedule: {scheduled / pending * 1e6:.2f}us per timer, "
+          f"cancel: {cancelled / (pending // 2) * 1e6:.2f}us per timer, "
+          f"advance with {scheduler.pending} pending: {advanced:.3f}s for 1000 ticks")
+
+
 if __name__ == "__main__":
 
     invoker = CommandInvoker()
@@ -93,3 +752,56 @@ if __name__ == "__main__":
     invoker.run("ON")
     invoker.run("POWER")
 
+    with ExecutorCommandInvoker(pool="thread", max_workers=4) as pooled:
+        pooled.register("ON", cmd1)
+        pooled.register("OFF", cmd2)
+        futures = [pooled.submit(name) for name in ("ON", "OFF", "ON")]
+        print(pooled.submit("POWER").exception())
+    print(all(future.done() for future in futures))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "commands.log")
+        durable = LoggingCommandInvoker(CommandLog(path))
+        durable.register("ON", cmd1)
+        durable.register("OFF", cmd2)
+        durable.run("ON")
+        durable.checkpoint(lambda: b"on" if rec.is_on else b"off")
+        durable.run("OFF")
+        durable.close()
+
+        rebuilt = Light()
+        restarted = LoggingCommandInvoker(CommandLog(path))
+        restarted.register("ON", Command_ON(rebuilt))
+        restarted.register("OFF", Command_OFF(rebuilt))
+        replayed = restarted.recover(
+            lambda snapshot: rebuilt.execute_ON() if snapshot == b"on" else rebuilt.execute_OFF())
+        print(replayed, rebuilt.is_on)
+        restarted.close()
+
+    undoable = UndoableCommandInvoker(max_entries=100)
+    undoable.register("ON", cmd1)
+    undoable.register("OFF", cmd2)
+    undoable.run("ON")
+    undoable.run("OFF")
+    undoable.undo()
+    print(rec.is_on)
+    undoable.redo()
+    print(rec.is_on, undoable.history_stats())
+
+    queued = QueuedCommandInvoker()
+    queued.register("ON", cmd1)
+    queued.register("OFF", cmd2)
+    for name in ("ON", "OFF", "ON", "OFF", "ON"):
+        queued.run(name)
+    queued.close()
+    print(f"{queued.submitted} commands submitted, {queued.executed} executed")
+
+    scheduler = TimerWheelScheduler(invoker, tick=0.01)
+    blink = scheduler.schedule("OFF", 0.02, interval=0.05)
+    scheduler.schedule("ON", 0.03)
+    scheduler.start()
+    time.sleep(0.15)
+    scheduler.cancel(blink)
+    scheduler.stop()
+
+    benchmark_scheduler()
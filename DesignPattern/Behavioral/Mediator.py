@@ -12,6 +12,12 @@ mediator object that redirects the calls to appropriate components. As a result,
 """
 
 from abc import ABC, abstractmethod
+from multiprocessing import Process
+from multiprocessing.shared_memory import SharedMemory
+import asyncio
+import inspect
+import struct
+import time
 
 
 class ComponentI(ABC):
@@ -62,6 +68,460 @@ class Mediator(object):
                 cmp.receive()
 
 
+class IndexedMediator(Mediator):
+    """
+        Mediator where components register interest in specific event types. An index from event
+        type to the interested components is kept up to date on registration, so a notification
+        touches only those components instead of every registered one. Components registered
+        without events are interested in all of them.
+        Dispatch modes: unicast to one component, multicast to the interested components and
+        broadcast to all components. notifyOthers keeps the Mediator behaviour on top of them.
+        """
+    def __init__(self):
+        super().__init__()
+        self._index = {}
+        self._everything = {}
+
+    def addComponents(self, component, events=None):
+        self._components.append(component)
+        if events is None:
+            self._everything[component] = None
+        else:
+            for event in events:
+                self._index.setdefault(event, {})[component] = None
+
+    def removeComponent(self, component):
+        self._components.remove(component)
+        self._everything.pop(component, None)
+        for interested in self._index.values():
+            interested.pop(component, None)
+
+    def unicast(self, event, target):
+        target.receive()
+
+    def multicast(self, event, sender=None):
+        for cmp in self._index.get(event, ()):
+            if cmp is not sender:
+                cmp.receive()
+        for cmp in self._everything:
+            if cmp is not sender:
+                cmp.receive()
+
+    def broadcast(self, event, sender=None):
+        for cmp in self._components:
+            if cmp is not sender:
+                cmp.receive()
+
+    def notifyOthers(self, event, component):
+        if event == "Only One":
+            if self._components:
+                self.unicast(event, self._components[0])
+        else:
+            self.multicast(event, component)
+
+
+class AsyncComponentA(ComponentA):
+    "Component of an AsyncMediator. Its receive() may be a plain method or a coroutine."
+
+    async def notify(self, event):
+        await self._mediator.notifyOthers(event, self)
+
+
+class SlowComponent(AsyncComponentA):
+
+    def __init__(self, mediator, name, delay):
+        super().__init__(mediator, name)
+        self._delay = delay
+
+    async def receive(self):
+        await asyncio.sleep(self._delay)
+        print(f'Component {self._name} received message')
+
+
+class InboxStats(object):
+
+    def __init__(self):
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+
+class AsyncMediator(Mediator):
+    """
+        Mediator delivering events through a bounded asyncio.Queue inbox per component, each
+        drained by its own task, so a slow component no longer blocks the sender or the other
+        components. When an inbox is full the backpressure `policy` decides: "block" waits for
+        room, "drop_oldest" discards the oldest queued event and "drop_newest" discards the new one.
+        metrics() reports queue depth, drops and lag (time spent in the inbox) per component.
+        """
+    policies = ("block", "drop_oldest", "drop_newest")
+
+    def __init__(self, inbox_size=100, policy="block"):
+        super().__init__()
+        if policy not in self.policies:
+            raise ValueError(f"unknown policy {policy!r}, use one of {self.policies}")
+        self._inbox_size = inbox_size
+        self._policy = policy
+        self._inboxes = {}
+        self._stats = {}
+        self._tasks = []
+        self._started = False
+
+    def addComponents(self, component):
+        super().addComponents(component)
+        self._inboxes[component] = asyncio.Queue(maxsize=self._inbox_size)
+        self._stats[component] = InboxStats()
+        if self._started:
+            self._tasks.append(asyncio.ensure_future(self._drain(component)))
+
+    def start(self):
+        """
+            Start one draining task per component, must be called from a running event loop.
+            Components added later get their task when they are added.
+            """
+        self._started = True
+        self._tasks = [asyncio.ensure_future(self._drain(cmp)) for cmp in self._components]
+
+    async def _drain(self, component):
+        inbox = self._inboxes[component]
+        stats = self._stats[component]
+        while True:
+            event, enqueued = await inbox.get()
+            stats.last_lag = time.monotonic() - enqueued
+            stats.max_lag = max(stats.max_lag, stats.last_lag)
+            try:
+                result = component.receive()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # a failing component must not stop its inbox from draining
+                stats.errors += 1
+            finally:
+                stats.delivered += 1
+                inbox.task_done()
+
+    async def _deliver(self, component, event):
+        inbox = self._inboxes[component]
+        item = (event, time.monotonic())
+        if self._policy == "block":
+            await inbox.put(item)
+            return
+        if inbox.full():
+            self._stats[component].dropped += 1
+            if self._policy == "drop_newest":
+                return
+            inbox.get_nowait()
+            inbox.task_done()
+        inbox.put_nowait(item)
+
+    async def notifyOthers(self, event, component):
+        for cmp in self._components:
+            if event == "Only One":
+                await self._deliver(cmp, event)
+                break
+            elif cmp is not component:
+                await self._deliver(cmp, event)
+
+    def metrics(self):
+        return {cmp: {"depth": self._inboxes[cmp].qsize(), "delivered": stats.delivered,
+                      "dropped": stats.dropped, "errors": stats.errors,
+                      "last_lag": stats.last_lag, "max_lag": stats.max_lag}
+                for cmp, stats in self._stats.items()}
+
+    async def stop(self):
+        "Wait until every inbox is drained, then stop the draining tasks."
+        for inbox in self._inboxes.values():
+            await inbox.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._started = False
+
+
+async def async_demo():
+    mediator = AsyncMediator(inbox_size=2, policy="drop_oldest")
+    fast = AsyncComponentA(mediator, "fast")
+    slow = SlowComponent(mediator, "slow", 0.05)
+    sender = AsyncComponentA(mediator, "sender")
+    for cmp in (fast, slow, sender):
+        mediator.addComponents(cmp)
+    mediator.start()
+    for _ in range(5):
+        await sender.notify("Tick")
+        await asyncio.sleep(0.01)
+    await mediator.stop()
+    for cmp, stats in mediator.metrics().items():
+        print(cmp._name, stats["delivered"], stats["dropped"], f"{stats['max_lag']:.3f}s")
+
+
+class SharedRingBuffer(object):
+    """
+        Single-producer single-consumer ring buffer in a multiprocessing.shared_memory block.
+        The header holds the write position (only moved by the producer), the read position
+        (only moved by the consumer) and the capacity; messages are framed by a 4 byte length.
+        Positions only grow, their difference is the number of bytes in use.
+        """
+    _position = struct.Struct("<Q")
+    _length = struct.Struct("<I")
+    _head, _tail, _size, _data = 0, 8, 16, 64
+
+    def __init__(self, name=None, capacity=1 << 20):
+        if name is None:
+            self._shm = SharedMemory(create=True, size=self._data + capacity)
+            self._shm.buf[:self._data] = bytes(self._data)
+            self._position.pack_into(self._shm.buf, self._size, capacity)
+        else:
+            self._shm = SharedMemory(name=name)
+        self._capacity = self._position.unpack_from(self._shm.buf, self._size)[0]
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _write(self, position, data):
+        start = position % self._capacity
+        first = min(len(data), self._capacity - start)
+        buf = self._shm.buf
+        buf[self._data + start:self._data + start + first] = data[:first]
+        buf[self._data:self._data + len(data) - first] = data[first:]
+
+    def _read(self, position, size):
+        start = position % self._capacity
+        first = min(size, self._capacity - start)
+        buf = self._shm.buf
+        return bytes(buf[self._data + start:self._data + start + first]) + \
+            bytes(buf[self._data:self._data + size - first])
+
+    def put(self, payload):
+        "Append one message, returns False when there is not enough room right now."
+        needed = self._length.size + len(payload)
+        if needed > self._capacity:
+            raise ValueError(f"message of {len(payload)} bytes can never fit a ring of {self._capacity} bytes")
+        buf = self._shm.buf
+        head = self._position.unpack_from(buf, self._head)[0]
+        tail = self._position.unpack_from(buf, self._tail)[0]
+        if needed > self._capacity - (head - tail):
+            return False
+        self._write(head, self._length.pack(len(payload)) + payload)
+        self._position.pack_into(buf, self._head, head + needed)
+        return True
+
+    def get(self):
+        "Remove and return the oldest message, None when the buffer is empty."
+        buf = self._shm.buf
+        head = self._position.unpack_from(buf, self._head)[0]
+        tail = self._position.unpack_from(buf, self._tail)[0]
+        if head == tail:
+            return None
+        size = self._length.unpack(self._read(tail, self._length.size))[0]
+        payload = self._read(tail + self._length.size, size)
+        self._position.pack_into(buf, self._tail, tail + self._length.size + size)
+        return payload
+
+    def close(self, unlink=False):
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+_STOP = b"x"
+
+
+def encode_event(event):
+    "Compact tagged encoding of the events sent between processes, instead of pickle."
+    if isinstance(event, str):
+        return b"s" + event.encode()
+    if isinstance(event, bytes):
+        return b"b" + event
+    if isinstance(event, bool) or event is None:
+        return b"n" if event is None else b"t" if event else b"f"
+    if isinstance(event, int):
+        return b"i" + struct.pack("<q", event)
+    if isinstance(event, float):
+        return b"d" + struct.pack("<d", event)
+    raise TypeError(f"cannot send event of type {type(event).__name__} between processes")
+
+
+def _run_component(component, index):
+    """
+        Worker loop. When the main process sends _STOP the worker forwards it on each of its own
+        rings and keeps draining until every producer's ring has delivered its _STOP, so the
+        events peers sent before they stopped are still received. A failing receive() doesn't
+        stop the worker, and a worker leaving the loop any other way still sends its _STOP.
+        """
+    mediator = component._mediator
+    mediator._attach(index)
+    inbox = mediator._inbox
+    running = set(range(len(inbox)))
+    idle = 0
+    try:
+        while running:
+            received = False
+            for producer, ring in enumerate(inbox):
+                payload = ring.get()
+                if payload is None:
+                    continue
+                if payload == _STOP:
+                    running.discard(producer)
+                    if producer == len(inbox) - 1:  # the main process, the last producer
+                        mediator._stop_peers()
+                    continue
+                received = True
+                try:
+                    component.receive()
+                except Exception as error:
+                    print(f'Component {component._name} failed to receive: {error!r}')
+            idle = 0 if received else idle + 1
+            if idle > 100:
+                time.sleep(0.0005)
+    finally:
+        if not mediator._stopping:
+            mediator._stop_peers()
+        mediator._detach()
+
+
+class ProcessMediator(Mediator):
+    """
+        Mediator running every component in its own worker process, so CPU-heavy components use
+        all cores. Components keep the notify()/receive() API: the component object is copied to
+        its worker together with this mediator, and events travel through SharedRingBuffers, one
+        per (producer, consumer) pair so each ring has a single writer and a single reader.
+        The main process is producer number len(components). Events are encoded with
+        encode_event, and a sender waits while the receiving ring is full; the main process
+        stops waiting for a worker which is no longer alive. An event larger than the ring
+        capacity raises ValueError.
+        Register all components before start(). Events a component notifies after its worker
+        began stopping are not forwarded.
+        """
+    def __init__(self, ring_capacity=1 << 20):
+        super().__init__()
+        self._ring_capacity = ring_capacity
+        self._ring_names = None
+        self._rings = None
+        self._outbox = None
+        self._inbox = None
+        self._index = None
+        self._stopping = False
+        self._processes = []
+
+    def __getstate__(self):
+        return {"_ring_names": self._ring_names, "_count": len(self._components)}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._components = []
+        self._stopping = False
+        self._processes = []
+
+    def _attach(self, index):
+        "Worker side: open the rings this worker writes to and reads from."
+        self._index = index
+        self._outbox = [SharedRingBuffer(name) for name in self._ring_names[index]]
+        self._inbox = [SharedRingBuffer(row[index]) for row in self._ring_names]
+
+    def _stop_peers(self):
+        "Worker side: this worker sends nothing after _STOP on any of its rings."
+        self._stopping = True
+        for target in range(self._count):
+            self._send(target, _STOP)
+
+    def _detach(self):
+        for ring in self._outbox + self._inbox:
+            ring.close()
+
+    def start(self):
+        count = len(self._components)
+        self._count = count
+        self._index = count
+        self._rings = [[SharedRingBuffer(capacity=self._ring_capacity) for _ in range(count)]
+                       for _ in range(count + 1)]
+        self._ring_names = [[ring.name for ring in row] for row in self._rings]
+        self._outbox = self._rings[count]
+        self._processes = [Process(target=_run_component, args=(cmp, index), daemon=True)
+                           for index, cmp in enumerate(self._components)]
+        for process in self._processes:
+            process.start()
+
+    def _send(self, target, payload, ring=None):
+        "Returns False if the target worker died before there was room for the payload."
+        ring = ring if ring is not None else self._outbox[target]
+        while not ring.put(payload):
+            if self._processes and not self._processes[target].is_alive():
+                return False
+            time.sleep(0.0001)
+        return True
+
+    def notifyOthers(self, event, component):
+        if self._stopping:
+            return
+        payload = encode_event(event)
+        if event == "Only One":
+            self._send(0, payload)
+            return
+        sender = self._index if self._index < self._count else self._position(component)
+        for target in range(self._count):
+            if target != sender:
+                self._send(target, payload)
+
+    def _position(self, component):
+        for index, cmp in enumerate(self._components):
+            if cmp is component:
+                return index
+        return None
+
+    def stop(self):
+        """
+            Let every worker drain the events sent before, then stop it and free the rings.
+            The _STOP of a worker that crashed is sent on its behalf, so its peers don't wait
+            for it forever.
+            """
+        self._stopping = True
+        try:
+            for target in range(self._count):
+                self._send(target, _STOP)
+            crashed = set()
+            while any(process.is_alive() for process in self._processes):
+                for index, process in enumerate(self._processes):
+                    process.join(0.01)
+                    if process.exitcode not in (None, 0) and index not in crashed:
+                        crashed.add(index)
+                        for target in range(self._count):  # it can't write its rings any more
+                            self._send(target, _STOP, self._rings[index][target])
+        finally:
+            for row in self._rings:
+                for ring in row:
+                    ring.close(unlink=True)
+            self._processes = []
+
+
+class CountingComponent(ComponentA):
+
+    def __init__(self, mediator, name):
+        super().__init__(mediator, name)
+        self.count = 0
+
+    def receive(self):
+        self.count += 1
+
+
+def benchmark_process_mediator(messages=200000):
+    "Messages per second from the main process to a component in a worker process."
+    mediator = ProcessMediator()
+    sender = CountingComponent(mediator, "sender")
+    receiver = CountingComponent(mediator, "receiver")
+    mediator.addComponents(sender)
+    mediator.addComponents(receiver)
+    mediator.start()
+    start = time.perf_counter()
+    for _ in range(messages):
+        sender.notify("Tick")
+    mediator.stop()
+    elapsed = time.perf_counter() - start
+    print(f"{messages / elapsed:,.0f} messages per second across processes")
+
+
 if __name__ == "__main__":
 
     mediator = Mediator()
@@ -79,3 +539,27 @@ if __name__ == "__main__":
     print("next")
     cmp3.notify("None")
 
+    print("indexed")
+    indexed = IndexedMediator()
+    cmp5 = ComponentA(indexed, "cmp5")
+    cmp6 = ComponentA(indexed, "cmp6")
+    cmp7 = ComponentA(indexed, "cmp7")
+    indexed.addComponents(cmp5)
+    indexed.addComponents(cmp6, events=["Price"])
+    indexed.addComponents(cmp7, events=["Stock"])
+    cmp5.notify("Price")
+    indexed.broadcast("Reset", cmp5)
+
+    print("async")
+    asyncio.run(async_demo())
+
+    print("processes")
+    processes = ProcessMediator()
+    workers = [ComponentA(processes, f"worker{number}") for number in range(3)]
+    for worker in workers:
+        processes.addComponents(worker)
+    processes.start()
+    workers[0].notify("Tick")
+    processes.stop()
+
+    benchmark_process_mediator()
@@ -10,6 +10,15 @@ You can use Command and Memento together when implementing “undo”. In this c
   before a command gets executed.
 """
 from __future__ import annotations
+from contextlib import redirect_stdout
+import copy
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
 
 
 class Memento:
@@ -76,6 +85,476 @@ class CareTaker:
             self._originator.restore(memento)
 
 
+def _common_prefix(old, new):
+    "Length of the common prefix, by binary search on slice comparisons which run in C."
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def make_delta(old, new):
+    """
+        Delta turning old into new. Strings, bytes, lists and tuples keep the common prefix and
+        suffix and store only the replaced middle part, dicts store the changed and removed keys.
+        Any other state is stored whole.
+        """
+    if isinstance(new, dict) and isinstance(old, dict):
+        changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+        return ("dict", changed, [key for key in old if key not in new])
+    if isinstance(new, (str, bytes, list, tuple)) and type(old) is type(new):
+        prefix = _common_prefix(old, new)
+        suffix = _common_prefix(old[prefix:][::-1], new[prefix:][::-1])
+        return ("sequence", prefix, suffix, new[prefix:len(new) - suffix])
+    return ("whole", new)
+
+
+def apply_delta(old, delta):
+    if delta[0] == "dict":
+        state = dict(old)
+        state.update(delta[1])
+        for key in delta[2]:
+            del state[key]
+        return state
+    if delta[0] == "sequence":
+        _, prefix, suffix, middle = delta
+        return old[:prefix] + middle + old[len(old) - suffix:]
+    return delta[1]
+
+
+class DeltaMemento(Memento):
+    "Memento storing only the difference to the previous version."
+
+    def __init__(self, delta):
+        super().__init__(None)
+        self._delta = delta
+
+
+class DeltaCareTaker(CareTaker):
+    """
+        CareTaker storing a full keyframe every `keyframe_every` versions and only deltas against
+        the previous version in between, so history memory grows with the size of the changes
+        rather than with state size times versions. undo(index) rebuilds the state from the
+        nearest keyframe before index, applying at most keyframe_every - 1 deltas.
+        """
+    def __init__(self, originator, keyframe_every=32):
+        super().__init__(originator)
+        self._keyframe_every = keyframe_every
+        self._previous = None
+
+    def backup(self):
+        print("CareTaker: Getting a copy of Originators current state")
+        state = self._detached(self._originator.save()._state)
+        if len(self._mementos) % self._keyframe_every == 0:
+            self._mementos.append(Memento(state))
+        else:
+            self._mementos.append(DeltaMemento(make_delta(self._previous, state)))
+        self._previous = state
+
+    def undo(self, index):
+        print("CareTaker: Restoring Originators state from Memento")
+        if 0 <= index < len(self._mementos):
+            keyframe = index - index % self._keyframe_every
+            state = self._mementos[keyframe]._state
+            for memento in self._mementos[keyframe + 1:index + 1]:
+                state = apply_delta(state, memento._delta)
+            self._originator.restore(Memento(self._detached(state)))
+
+    @staticmethod
+    def _detached(state):
+        "Copy of a mutable state, so the originator mutating it in place can't change the history."
+        if isinstance(state, (str, bytes, tuple)):
+            return state
+        return copy.deepcopy(state)
+
+
+def estimate_size(state):
+    "Rough number of bytes held by a state made of strings, numbers and nested containers."
+    size = sys.getsizeof(state)
+    if isinstance(state, dict):
+        size += sum(estimate_size(key) + estimate_size(value) for key, value in state.items())
+    elif isinstance(state, (list, tuple, set)):
+        size += sum(estimate_size(item) for item in state)
+    return size
+
+
+class SnapshotStore(object):
+    "Compressed on-disk store of memento states, one file per version."
+
+    def __init__(self, directory):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, version):
+        return os.path.join(self._directory, f"{version}.snapshot")
+
+    def put(self, version, state):
+        with open(self._path(version), "wb") as file:
+            file.write(zlib.compress(pickle.dumps(state)))
+
+    def get(self, version):
+        with open(self._path(version), "rb") as file:
+            return pickle.loads(zlib.decompress(file.read()))
+
+    def __contains__(self, version):
+        return os.path.exists(self._path(version))
+
+
+class BoundedCareTaker(CareTaker):
+    """
+        CareTaker keeping at most `max_count` mementos and `max_bytes` estimated bytes in memory.
+        Once a cap is exceeded a memento is evicted following `policy`: "oldest" evicts the
+        oldest version first, "thin" first evicts old versions that are not a multiple of
+        `thin_every`, so the history gets sparser as it ages. The `keep_recent` newest versions
+        (at least one, `thin_every` by default) are never thinned. With a SnapshotStore evicted
+        mementos are spilled to disk and loaded again lazily by undo(index); without one they
+        are lost. Indexes passed to undo() are backup numbers and stay valid after evictions.
+        """
+    policies = ("oldest", "thin")
+
+    def __init__(self, originator, max_count=1000, max_bytes=64 << 20, policy="oldest", thin_every=10,
+                 keep_recent=None, store=None):
+        super().__init__(originator)
+        if policy not in self.policies:
+            raise ValueError(f"unknown policy {policy!r}, use one of {self.policies}")
+        self._mementos = {}
+        self._sizes = {}
+        self._thinnable = {}
+        self._versions = 0
+        self._bytes = 0
+        self._max_count = max_count
+        self._max_bytes = max_bytes
+        self._policy = policy
+        self._thin_every = thin_every
+        self._keep_recent = max(1, thin_every if keep_recent is None else keep_recent)
+        self._store = store
+
+    def backup(self):
+        print("CareTaker: Getting a copy of Originators current state")
+        memento = self._originator.save()
+        version = self._versions
+        self._versions += 1
+        self._mementos[version] = memento
+        self._sizes[version] = estimate_size(memento._state)
+        self._bytes += self._sizes[version]
+        if version % self._thin_every:
+            self._thinnable[version] = None
+        while len(self._mementos) > 1 and (len(self._mementos) > self._max_count or self._bytes > self._max_bytes):
+            self._evict()
+
+    def _evict(self):
+        candidate = next(iter(self._thinnable), None)
+        if self._policy == "thin" and candidate is not None and candidate < self._versions - self._keep_recent:
+            version = candidate
+        else:
+            version = next(iter(self._mementos))
+        self._thinnable.pop(version, None)
+        memento = self._mementos.pop(version)
+        self._bytes -= self._sizes.pop(version)
+        if self._store is not None:
+            self._store.put(version, memento._state)
+
+    def undo(self, index):
+        print("CareTaker: Restoring Originators state from Memento")
+        if index in self._mementos:
+            self._originator.restore(self._mementos[index])
+        elif self._store is not None and 0 <= index < self._versions and index in self._store:
+            self._originator.restore(Memento(self._store.get(index)))
+
+    def memory_usage(self):
+        return {"in_memory": len(self._mementos), "bytes": self._bytes, "versions": self._versions}
+
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_BITS = 64
+
+
+class PersistentVector(object):
+    """
+        Immutable vector stored as a trie of 32-wide tuples. set() and append() copy only the
+        path from the root to the changed leaf, O(log32 n), and share every other node with the
+        previous version, so keeping old versions around costs little memory.
+        """
+    __slots__ = ("_root", "_shift", "_count")
+
+    def __init__(self, root=(), shift=0, count=0):
+        self._root = root
+        self._shift = shift
+        self._count = count
+
+    @classmethod
+    def from_list(cls, values):
+        vector = cls()
+        for value in values:
+            vector = vector.append(value)
+        return vector
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("vector index out of range")
+        node = self._root
+        for shift in range(self._shift, 0, -_BITS):
+            node = node[(index >> shift) & _MASK]
+        return node[index & _MASK]
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def set(self, index, value):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("vector index out of range")
+        return PersistentVector(self._set(self._root, self._shift, index, value), self._shift, self._count)
+
+    def _set(self, node, shift, index, value):
+        slot = (index >> shift) & _MASK
+        if shift:
+            value = self._set(node[slot], shift - _BITS, index, value)
+        return node[:slot] + (value,) + node[slot + 1:]
+
+    def append(self, value):
+        if self._count == 1 << (self._shift + _BITS):  # the trie is full, grow a level
+            root = (self._root, self._path(self._shift, value))
+            return PersistentVector(root, self._shift + _BITS, self._count + 1)
+        return PersistentVector(self._push(self._root, self._shift, value), self._shift, self._count + 1)
+
+    def _push(self, node, shift, value):
+        slot = (self._count >> shift) & _MASK
+        if not shift:
+            return node + (value,)
+        if slot < len(node):
+            return node[:slot] + (self._push(node[slot], shift - _BITS, value),)
+        return node + (self._path(shift - _BITS, value),)
+
+    def _path(self, shift, value):
+        node = (value,)
+        for _ in range(0, shift, _BITS):
+            node = (node,)
+        return node
+
+    def set_in(self, path, value):
+        if len(path) == 1:
+            return self.set(path[0], value)
+        return self.set(path[0], self[path[0]].set_in(path[1:], value))
+
+    def __repr__(self):
+        return f"PersistentVector({list(self)!r})"
+
+
+class _MapNode(object):
+    "Bitmap-indexed HAMT node: bit i of bitmap says whether child i is stored in entries."
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _Collision(object):
+    "Keys whose 64 hash bits are all equal, kept as a tuple of (key, value) pairs."
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+
+_MISSING = object()
+
+
+class PersistentMap(object):
+    """
+        Immutable mapping stored as a hash array mapped trie. Every level consumes 5 bits of the
+        key's hash, and a node holds only the children present, indexed by a bitmap. set() and
+        delete() copy the O(log32 n) nodes on the path to the key and share all the others.
+        """
+    __slots__ = ("_root", "_count")
+
+    def __init__(self, root=None, count=0):
+        self._root = root if root is not None else _MapNode(0, ())
+        self._count = count
+
+    @classmethod
+    def from_dict(cls, values):
+        result = cls()
+        for key, value in values.items():
+            result = result.set(key, value)
+        return result
+
+    def __len__(self):
+        return self._count
+
+    def get(self, key, default=None):
+        node = self._root
+        hashed = hash(key) & ((1 << _HASH_BITS) - 1)
+        shift = 0
+        while True:
+            if isinstance(node, _Collision):
+                for other, value in node.pairs:
+                    if other == key:
+                        return value
+                return default
+            bit = 1 << ((hashed >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+            entry = node.entries[bin(node.bitmap & (bit - 1)).count("1")]
+            if isinstance(entry, tuple):
+                return entry[1] if entry[0] == key else default
+            node = entry
+            shift += _BITS
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key, value):
+        hashed = hash(key) & ((1 << _HASH_BITS) - 1)
+        root, added = self._assoc(self._root, 0, hashed, key, value)
+        return PersistentMap(root, self._count + added)
+
+    def _assoc(self, node, shift, hashed, key, value):
+        if isinstance(node, _Collision):
+            pairs = [(other, old) for other, old in node.pairs if other != key]
+            return _Collision(tuple(pairs) + ((key, value),)), len(pairs) == len(node.pairs)
+        bit = 1 << ((hashed >> shift) & _MASK)
+        slot = bin(node.bitmap & (bit - 1)).count("1")
+        entries = node.entries
+        if not node.bitmap & bit:
+            return _MapNode(node.bitmap | bit, entries[:slot] + ((key, value),) + entries[slot:]), True
+        entry = entries[slot]
+        if isinstance(entry, tuple):
+            if entry[0] == key:
+                replaced, added = (key, value), False
+            else:
+                other_hash = hash(entry[0]) & ((1 << _HASH_BITS) - 1)
+                replaced = self._pair(shift + _BITS, other_hash, entry, hashed, (key, value))
+                added = True
+        else:
+            replaced, added = self._assoc(entry, shift + _BITS, hashed, key, value)
+        return _MapNode(node.bitmap, entries[:slot] + (replaced,) + entries[slot + 1:]), added
+
+    def _pair(self, shift, first_hash, first, second_hash, second):
+        if shift >= _HASH_BITS:
+            return _Collision((first, second))
+        first_bit = (first_hash >> shift) & _MASK
+        second_bit = (second_hash >> shift) & _MASK
+        if first_bit == second_bit:
+            return _MapNode(1 << first_bit, (self._pair(shift + _BITS, first_hash, first, second_hash, second),))
+        entries = (first, second) if first_bit < second_bit else (second, first)
+        return _MapNode((1 << first_bit) | (1 << second_bit), entries)
+
+    def delete(self, key):
+        if key not in self:
+            raise KeyError(key)
+        hashed = hash(key) & ((1 << _HASH_BITS) - 1)
+        return PersistentMap(self._dissoc(self._root, 0, hashed, key), self._count - 1)
+
+    def _dissoc(self, node, shift, hashed, key):
+        if isinstance(node, _Collision):
+            return _Collision(tuple(pair for pair in node.pairs if pair[0] != key))
+        bit = 1 << ((hashed >> shift) & _MASK)
+        slot = bin(node.bitmap & (bit - 1)).count("1")
+        entry = node.entries[slot]
+        if not isinstance(entry, tuple):
+            entry = self._dissoc(entry, shift + _BITS, hashed, key)
+            if (entry.bitmap if isinstance(entry, _MapNode) else len(entry.pairs)):
+                return _MapNode(node.bitmap, node.entries[:slot] + (entry,) + node.entries[slot + 1:])
+        return _MapNode(node.bitmap & ~bit, node.entries[:slot] + node.entries[slot + 1:])
+
+    def items(self):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for entry in (node.pairs if isinstance(node, _Collision) else node.entries):
+                if isinstance(entry, tuple):
+                    yield entry
+                else:
+                    stack.append(entry)
+
+    def __iter__(self):
+        return (key for key, _ in self.items())
+
+    def set_in(self, path, value):
+        if len(path) == 1:
+            return self.set(path[0], value)
+        return self.set(path[0], self[path[0]].set_in(path[1:], value))
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+
+def freeze(state):
+    "Convert nested dicts and lists into PersistentMaps and PersistentVectors."
+    if isinstance(state, dict):
+        return PersistentMap.from_dict({key: freeze(value) for key, value in state.items()})
+    if isinstance(state, list):
+        return PersistentVector.from_list([freeze(value) for value in state])
+    return state
+
+
+class PersistentOriginator(Originator):
+    """
+        Originator whose state is a persistent structure built by freeze(). Mutations build a new
+        version sharing the unchanged subtrees, so save() is O(1) without aliasing mutable state,
+        and thousands of mementos cost little more memory than one state.
+        """
+    def __init__(self, state=None):
+        super().__init__()
+        self._state = freeze(state if state is not None else {})
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        print(f"Originator: Setting state to `{state}`")
+        self._state = freeze(state)
+
+    def set_in(self, path, value):
+        print(f"Originator: Setting {list(path)} to `{value}`")
+        self._state = self._state.set_in(path, freeze(value))
+
+
+def benchmark_caretakers(versions=2000, size=100000):
+    "History memory and restore latency of CareTaker and DeltaCareTaker for small edits of a large text."
+    for caretaker_class in (CareTaker, DeltaCareTaker):
+        originator = Originator()
+        caretaker = caretaker_class(originator)
+        text = "x" * size
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            tracemalloc.start()
+            for version in range(versions):
+                position = version * 37 % size
+                text = text[:position] + "edit" + text[position + 4:]
+                originator.state = text
+                caretaker.backup()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            start = time.perf_counter()
+            for index in range(0, versions, 7):
+                caretaker.undo(index)
+            restore = (time.perf_counter() - start) / len(range(0, versions, 7))
+        print(f"{caretaker_class.__name__}: {memory / 1e6:.1f} MB history, {restore * 1e6:.0f}us per undo")
+
+
 if __name__ == "__main__":
     originator = Originator()
     memento = Memento("First")
@@ -91,3 +570,30 @@ if __name__ == "__main__":
 
     caretaker.undo(0)
     print(originator.state)
+
+    delta_caretaker = DeltaCareTaker(originator, keyframe_every=2)
+    for state in ("draft", "draft v2", "final draft v2"):
+        originator.state = state
+        delta_caretaker.backup()
+    delta_caretaker.undo(1)
+    print(originator.state)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bounded = BoundedCareTaker(originator, max_count=3, policy="thin", thin_every=2,
+                                   store=SnapshotStore(directory))
+        for number in range(6):
+            originator.state = f"state #{number}"
+            bounded.backup()
+        print(bounded.memory_usage())
+        bounded.undo(1)
+        print(originator.state)
+
+    document = PersistentOriginator({"title": "draft", "lines": [f"line {n}" for n in range(1000)]})
+    history = CareTaker(document)
+    history.backup()
+    document.set_in(["lines", 10], "changed line")
+    history.backup()
+    history.undo(0)
+    print(document.state["lines"][10], document.state["title"])
+
+    benchmark_caretakers()
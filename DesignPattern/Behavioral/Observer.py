@@ -15,7 +15,15 @@ The Observer pattern suggests that you add a subscription mechanism to the publi
 """
 
 from abc import ABC, abstractmethod
-from typing import List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Dict
+import heapq
+import os
+import threading
+import time
+import weakref
 
 
 #Subject's interface from where multiple subjects can be implement these methods.
@@ -41,42 +49,549 @@ class ObserverInterface(ABC):
     def update(self):
         pass
 
+    # called with the collected events by a Batched subscription, observers able to handle
+    # many events in one call override it
+    def update_batch(self, events):
+        for _ in events:
+            self.update()
+
 
 # create object class, which will take Subject to which it will subscribe
 class Observer(ObserverInterface):
 
-    def __init__(self, Name, Event):
+    # extra keyword arguments describe the subscription, e.g. delivery= or topic=
+    def __init__(self, Name, Event, **subscription):
         self.name = Name
-        Event.subscribe(self)
+        Event.subscribe(self, **subscription)
 
     def update(self):
         print(f'observer {self.name} is notified')
 
 
 # create subject class and implement subscription mechanism and store all subscribers
+# subscribers are kept in a dict keyed by id, which keeps the subscription order and makes
+# subscribe/unsubscribe O(1). With weak=True only weak references are kept, and observers
+# which are garbage collected drop out of the subscription without unsubscribing.
 class ConcreteEventA(EventInterface):
 
-    observerList: List[Observer]
+    observers: Dict[int, Observer]
+
+    def __init__(self, weak=False):
+        self.observers = {}
+        self._weak = weak
 
-    def __init__(self):
-        self.observerList = []
+    @property
+    def observerList(self):
+        return list(self._live())
 
     def subscribe(self, observer):
-        if observer in self.observerList:
+        if id(observer) in self.observers:
             print(f'observer {observer.name} has already Subscribed')
         else:
-            self.observerList.append(observer)
+            if self._weak:
+                self.observers[id(observer)] = weakref.ref(observer, self._discard(id(observer)))
+            else:
+                self.observers[id(observer)] = observer
             print(f'observer {observer.name} has Subscribed')
 
+    def _discard(self, key):
+        event = weakref.ref(self)
+
+        def discard(ref):
+            alive = event()
+            if alive is not None and alive.observers.get(key) is ref:
+                del alive.observers[key]
+                alive._collected(key)
+        return discard
+
+    # called when a weakly referenced observer was garbage collected, subclasses keeping
+    # per-observer state drop it here so a later observer reusing the id doesn't inherit it
+    def _collected(self, key):
+        pass
+
     def unsubscribe(self, observer):
-        self.observerList.remove(observer)
+        if self.observers.pop(id(observer), None) is None:
+            raise ValueError(f'observer {observer.name} is not subscribed')
         print(f'observer {observer.name} has Unsubscribed')
 
+    def _live(self):
+        if not self._weak:
+            return self.observers.values()
+        return [obs for obs in (ref() for ref in list(self.observers.values())) if obs is not None]
+
     def notify(self):
-        for obs in self.observerList:
+        for obs in self._live():
             obs.update()
 
 
+# notify() hands the update to a thread pool and returns at once. Every observer has its own
+# bounded queue of pending updates, drained by one pool thread at a time so each observer still
+# sees its updates in order. An update slower than `timeout`, a failing update or a full queue is
+# a strike; after `quarantine_after` strikes in a row the observer is quarantined and skipped
+# until release() is called. A thread can't be interrupted, so a slow update still finishes.
+# With weak=True quarantined observers are held by weak references too. notify() raises
+# RuntimeError once close() was called.
+class FanOutEventA(ConcreteEventA):
+
+    def __init__(self, weak=False, workers=8, queue_size=100, timeout=0.1, quarantine_after=3):
+        super().__init__(weak)
+        self._pool = ThreadPoolExecutor(workers)
+        self._queue_size = queue_size
+        self._timeout = timeout
+        self._quarantine_after = quarantine_after
+        self._lanes = {}
+        self._draining = set()
+        self._strikes = {}
+        self.quarantined = {}
+        self._latencies = deque(maxlen=10000)
+        self._lock = threading.Condition()
+        self._closed = False
+
+    def notify(self):
+        now = time.monotonic()
+        for obs in self._live():
+            key = id(obs)
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("cannot notify after close()")
+                if key in self.quarantined:
+                    continue
+                lane = self._lanes.setdefault(key, deque())
+                if len(lane) >= self._queue_size:
+                    self._strike(obs)
+                    continue
+                lane.append(now)
+                if key in self._draining:
+                    continue
+                self._draining.add(key)
+            self._pool.submit(self._drain, obs, key)
+
+    def _drain(self, obs, key, batch=32):
+        for _ in range(batch):
+            with self._lock:
+                lane = self._lanes.get(key)
+                if not lane:
+                    self._draining.discard(key)
+                    self._lock.notify_all()
+                    return
+                enqueued = lane.popleft()
+            start = time.monotonic()
+            try:
+                obs.update()
+                failed = False
+            except Exception:
+                failed = True
+            done = time.monotonic()
+            with self._lock:
+                self._latencies.append(done - enqueued)
+                if failed or done - start > self._timeout:
+                    self._strike(obs)
+                else:
+                    self._strikes.pop(key, None)
+        self._pool.submit(self._drain, obs, key)  # let other observers use this thread
+
+    def _strike(self, obs):
+        key = id(obs)
+        self._strikes[key] = self._strikes.get(key, 0) + 1
+        if self._strikes[key] >= self._quarantine_after:
+            self.quarantined[key] = weakref.ref(obs) if self._weak else obs
+            self._lanes.pop(key, None)
+            print(f'observer {obs.name} is quarantined')
+
+    def _collected(self, key):
+        with self._lock:
+            self._lanes.pop(key, None)
+            self._strikes.pop(key, None)
+            self.quarantined.pop(key, None)
+
+    def release(self, observer):
+        with self._lock:
+            self.quarantined.pop(id(observer), None)
+            self._strikes.pop(id(observer), None)
+
+    def latency_percentiles(self, percentiles=(50, 95, 99)):
+        "Seconds from notify() to the end of update(), over the most recent deliveries."
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return {}
+        return {p: samples[min(len(samples) - 1, len(samples) * p // 100)] for p in percentiles}
+
+    def close(self):
+        "Wait for the queued updates to be delivered and stop the pool."
+        with self._lock:
+            self._closed = True
+            self._lock.wait_for(lambda: not self._draining)
+        self._pool.shutdown()
+
+
+# delivery policies of a BufferedEventA subscription. offer() receives every event and returns
+# the events to deliver right away, if any; due() returns the events whose delay has passed.
+class Batched(object):
+
+    def __init__(self, max_size=100, max_delay=0.05):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.deadline = None
+        self._pending = []
+
+    def offer(self, event, now):
+        if not self._pending:
+            self.deadline = now + self.max_delay
+        self._pending.append(event)
+        if len(self._pending) >= self.max_size:
+            return self._take()
+        return None
+
+    def due(self, now):
+        if self._pending and now >= self.deadline:
+            return self._take()
+        return None
+
+    def _take(self):
+        events, self._pending = self._pending, []
+        self.deadline = None
+        return events
+
+    def deliver(self, observer, events):
+        observer.update_batch(events)
+
+
+# at most one update per interval: the first event is delivered at once, later ones in the same
+# interval are folded into one update at its end
+class Throttled(object):
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.deadline = None
+        self._next_allowed = 0.0
+        self._latest = None
+
+    def offer(self, event, now):
+        if now >= self._next_allowed and self.deadline is None:
+            self._next_allowed = now + self.interval
+            return [event]
+        self._latest = event
+        self.deadline = self._next_allowed
+        return None
+
+    def due(self, now):
+        if self.deadline is not None and now >= self.deadline:
+            self._next_allowed = now + self.interval
+            self.deadline = None
+            return [self._latest]
+        return None
+
+    def deliver(self, observer, events):
+        observer.update()
+
+
+# a single update once no event arrived for `delay` seconds
+class Debounced(object):
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.deadline = None
+        self._latest = None
+
+    def offer(self, event, now):
+        self._latest = event
+        self.deadline = now + self.delay
+        return None
+
+    def due(self, now):
+        if self.deadline is not None and now >= self.deadline:
+            self.deadline = None
+            return [self._latest]
+        return None
+
+    def deliver(self, observer, events):
+        observer.update()
+
+
+# subject whose subscriptions can carry a delivery policy: Batched, Throttled or Debounced.
+# notify() takes an optional event payload. Delayed deliveries are made by one background thread
+# sleeping until the earliest deadline, kept in a heap with at most one live entry per subscription;
+# it is only woken when a deadline earlier than the one it sleeps for shows up. Subscriptions
+# without a policy are updated at once. A delayed update raising is counted in `failed` and
+# doesn't stop the deliveries to the other observers.
+class BufferedEventA(ConcreteEventA):
+
+    def __init__(self, weak=False):
+        super().__init__(weak)
+        self._deliveries = {}
+        self._deadlines = []
+        self._scheduled = {}
+        self.failed = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def subscribe(self, observer, delivery=None):
+        subscribed = id(observer) in self.observers
+        super().subscribe(observer)
+        with self._condition:
+            if delivery is not None:
+                self._deliveries[id(observer)] = delivery
+            elif not subscribed:
+                self._deliveries.pop(id(observer), None)
+
+    def unsubscribe(self, observer):
+        super().unsubscribe(observer)
+        with self._condition:
+            self._deliveries.pop(id(observer), None)
+
+    def _collected(self, key):
+        self._deliveries.pop(key, None)
+
+    # push the deadline of a subscription unless an earlier entry is already in the heap
+    def _schedule(self, key, delivery):
+        deadline = delivery.deadline
+        scheduled = self._scheduled.get(key)
+        if deadline is None or (scheduled is not None and scheduled <= deadline):
+            return
+        earliest = self._deadlines[0][0] if self._deadlines else None
+        self._scheduled[key] = deadline
+        heapq.heappush(self._deadlines, (deadline, key))
+        if earliest is None or deadline < earliest:
+            self._condition.notify()
+
+    def notify(self, event=None):
+        now = time.monotonic()
+        for obs in self._live():
+            delivery = self._deliveries.get(id(obs))
+            if delivery is None:
+                obs.update()
+                continue
+            with self._condition:
+                events = delivery.offer(event, now)
+                self._schedule(id(obs), delivery)
+            if events:
+                delivery.deliver(obs, events)
+
+    def _flush_loop(self):
+        while self._flush_next():
+            pass
+
+    # one step of the flusher, kept in its own frame so the thread doesn't hold on to a weakly
+    # subscribed observer while it sleeps
+    def _flush_next(self):
+        with self._condition:
+            if self._closed:
+                return False
+            now = time.monotonic()
+            if not self._deadlines or self._deadlines[0][0] > now:
+                self._condition.wait(self._deadlines[0][0] - now if self._deadlines else None)
+                return True
+            deadline, key = heapq.heappop(self._deadlines)
+            if self._scheduled.get(key) != deadline:
+                return True  # superseded by an earlier entry
+            del self._scheduled[key]
+            delivery = self._deliveries.get(key)
+            observer = self.observers.get(key)
+            if self._weak and observer is not None:
+                observer = observer()
+            if delivery is None or observer is None:
+                return True
+            events = delivery.due(now)
+            self._schedule(key, delivery)  # e.g. a Debounced deadline moved later
+        if events:
+            self._deliver(observer, delivery, events)
+        return True
+
+    def _deliver(self, observer, delivery, events):
+        try:
+            delivery.deliver(observer, events)
+        except Exception as error:
+            print(f'observer {observer.name} failed to update: {error!r}')
+            with self._condition:
+                self.failed += 1
+
+    def flush(self, force=False):
+        "Deliver the events whose delay has passed, or every pending event with force."
+        ready = []
+        with self._condition:
+            for obs in self._live():
+                delivery = self._deliveries.get(id(obs))
+                if delivery is not None:
+                    events = delivery.due(float("inf") if force else time.monotonic())
+                    if events:
+                        ready.append((obs, delivery, events))
+        for obs, delivery, events in ready:
+            self._deliver(obs, delivery, events)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
+        self.flush(force=True)
+
+
+_MISSING = object()
+
+
+def _attribute(event, name):
+    if isinstance(event, dict):
+        return event.get(name, _MISSING)
+    return getattr(event, name, _MISSING)
+
+
+# subject whose subscriptions can carry a topic and/or an attribute-equality filter, e.g.
+# subscribe(obs, topic="orders", where={"region": "EU"}). Subscriptions are indexed by topic, or
+# by their first (attribute, value) pair, so notify() looks at the matching candidates only
+# instead of every subscriber. Observers without a filter receive every event. Subscribing again
+# replaces the filter, keeping the observer's place in the notification order.
+class FilteredEventA(ConcreteEventA):
+
+    def __init__(self, weak=False):
+        super().__init__(weak)
+        self._filters = {}
+        self._unfiltered = {}
+        self._by_topic = {}
+        self._by_attribute = {}
+        self._indexed_attributes = {}
+        self._sequence = 0
+
+    def subscribe(self, observer, topic=None, where=None):
+        where = dict(where or {})
+        if topic is not None:
+            index_key = ("topic", topic)
+        elif where:
+            attribute, value = next(iter(where.items()))
+            del where[attribute]
+            index_key = ("attribute", (attribute, value))
+        else:
+            index_key = None
+        try:
+            hash(index_key)
+        except TypeError:
+            raise TypeError(f"the topic or first where value must be hashable, got {index_key[1]!r}") from None
+        key = id(observer)
+        if key in self.observers and key in self._filters:
+            sequence = self._forget(key)
+            print(f'observer {observer.name} has changed its Subscription')
+        else:
+            super().subscribe(observer)
+            self._sequence += 1
+            sequence = self._sequence
+        if index_key is None:
+            self._unfiltered[key] = None
+        elif index_key[0] == "topic":
+            self._by_topic.setdefault(topic, {})[key] = None
+        else:
+            self._by_attribute.setdefault(index_key[1], {})[key] = None
+            self._indexed_attributes[attribute] = self._indexed_attributes.get(attribute, 0) + 1
+        self._filters[key] = (sequence, index_key, where)
+
+    def unsubscribe(self, observer):
+        super().unsubscribe(observer)
+        self._forget(id(observer))
+
+    def _collected(self, key):
+        if key in self._filters:
+            self._forget(key)
+
+    # drop the filter of `key` from the indexes and return its sequence number
+    def _forget(self, key):
+        sequence, index_key, _ = self._filters.pop(key)
+        if index_key is None:
+            del self._unfiltered[key]
+            return sequence
+        kind, value = index_key
+        index = self._by_topic if kind == "topic" else self._by_attribute
+        del index[value][key]
+        if not index[value]:
+            del index[value]
+        if kind == "attribute":
+            self._indexed_attributes[value[0]] -= 1
+            if not self._indexed_attributes[value[0]]:
+                del self._indexed_attributes[value[0]]
+        return sequence
+
+    def _matching(self, event, topic):
+        candidates = list(self._unfiltered)
+        if topic is not None:
+            candidates.extend(self._by_topic.get(topic, ()))
+        for attribute in list(self._indexed_attributes):  # may shrink when a weak observer is collected
+            value = _attribute(event, attribute)
+            if value is not _MISSING:
+                try:
+                    candidates.extend(self._by_attribute.get((attribute, value), ()))
+                except TypeError:  # unhashable value can't match an indexed filter
+                    pass
+        matching = []
+        for key in candidates:
+            if key not in self._filters:
+                continue
+            sequence, _, where = self._filters[key]
+            if all(_attribute(event, name) == value for name, value in where.items()):
+                matching.append((sequence, key))
+        matching.sort()
+        return [key for _, key in matching]
+
+    def notify(self, event=None, topic=None):
+        for key in self._matching(event, topic):
+            obs = self.observers.get(key)
+            if obs is not None and self._weak:
+                obs = obs()
+            if obs is not None:
+                obs.update()
+
+
+class CountingObserver(Observer):
+
+    def __init__(self, Name, Event, **subscription):
+        self.calls = 0
+        self.events = 0
+        super().__init__(Name, Event, **subscription)
+
+    def update(self):
+        self.calls += 1
+        self.events += 1
+
+    def update_batch(self, events):
+        self.calls += 1
+        self.events += len(events)
+
+
+class SlowObserver(Observer):
+
+    def __init__(self, Name, Event, delay):
+        self.delay = delay
+        super().__init__(Name, Event)
+
+    def update(self):
+        time.sleep(self.delay)
+        super().update()
+
+
+def benchmark_churn(subscribers=100000):
+    "Subscribe and unsubscribe many observers, with the former list based subscription as baseline."
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        observers = [Observer(str(number), ConcreteEventA()) for number in range(subscribers)]
+        start = time.perf_counter()
+        baseline = []
+        for obs in observers[:subscribers // 10]:  # a tenth of the work, it is quadratic
+            if obs not in baseline:
+                baseline.append(obs)
+        for obs in observers[:subscribers // 10]:
+            baseline.remove(obs)
+        listed = time.perf_counter() - start
+        timings = []
+        for weak in (False, True):
+            event = ConcreteEventA(weak=weak)
+            start = time.perf_counter()
+            for obs in observers:
+                event.subscribe(obs)
+            for obs in observers:
+                event.unsubscribe(obs)
+            timings.append(time.perf_counter() - start)
+    print(f"list: {listed:.3f}s for {subscribers // 10} subscribers, "
+          f"dict: {timings[0]:.3f}s and weak dict: {timings[1]:.3f}s for {subscribers} subscribers")
+
+
 if __name__ == "__main__":
 
     eventA = ConcreteEventA()
@@ -104,3 +619,36 @@ if __name__ == "__main__":
 
 
     eventB.notify()
+
+    eventC = ConcreteEventA(weak=True)
+    Observer("Temporary", eventC)  # not referenced anywhere else, dropped at once
+    kept = Observer("Kept", eventC)
+    eventC.notify()
+
+    eventD = FanOutEventA(workers=4, queue_size=2, timeout=0.05, quarantine_after=2)
+    Observer("Fast", eventD)
+    SlowObserver("Slow", eventD, 0.1)
+    for _ in range(4):
+        eventD.notify()
+    eventD.close()
+    print({p: f"{latency * 1000:.1f}ms" for p, latency in eventD.latency_percentiles().items()})
+
+    eventE = BufferedEventA()
+    batched = CountingObserver("Batched", eventE, delivery=Batched(max_size=500, max_delay=0.01))
+    throttled = CountingObserver("Throttled", eventE, delivery=Throttled(0.01))
+    debounced = CountingObserver("Debounced", eventE, delivery=Debounced(0.01))
+    for change in range(5000):
+        eventE.notify(change)
+    eventE.close()
+    for obs in (batched, throttled, debounced):
+        print(f"observer {obs.name}: {obs.calls} calls")
+
+    eventF = FilteredEventA()
+    Observer("All", eventF)
+    Observer("Orders", eventF, topic="orders")
+    Observer("EU orders", eventF, topic="orders", where={"region": "EU"})
+    Observer("US", eventF, where={"region": "US"})
+    eventF.notify({"region": "EU"}, topic="orders")
+    eventF.notify({"region": "US"}, topic="refunds")
+
+    benchmark_churn()